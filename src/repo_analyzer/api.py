@@ -1,18 +1,65 @@
 """FastAPI web service for repo analysis."""
 
+import functools
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Annotated
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
 from .engine import analyze_org
+from .exporter import ResultExporter
+from .fetcher import GitHubFetcher
+from .scorer import HealthScorer
+from .selector import RepoSelector
 
+
+# One instance of each component per worker process, shared across requests
+@functools.lru_cache(maxsize=1)
+def get_fetcher() -> GitHubFetcher:
+    return GitHubFetcher()
+
+
+@functools.lru_cache(maxsize=1)
+def get_selector() -> RepoSelector:
+    return RepoSelector()
+
+
+@functools.lru_cache(maxsize=1)
+def get_scorer() -> HealthScorer:
+    return HealthScorer()
+
+
+@functools.lru_cache(maxsize=1)
+def get_exporter() -> ResultExporter:
+    return ResultExporter()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create the shared components on startup and close them on shutdown."""
+    get_fetcher()
+    get_selector()
+    get_scorer()
+    get_exporter()
+
+    yield
+
+    await get_fetcher().close()
+
+
+# JSON endpoints declare a response_model so FastAPI serializes them straight
+# to bytes with pydantic-core; a custom default_response_class (for example
+# ORJSONResponse) would bypass that path.
 app = FastAPI(
     title="GitHub Repo Analyzer",
     version="0.1.0",
     description="Analyze GitHub organizations and calculate repository health scores",
+    lifespan=lifespan,
 )
 
 
@@ -43,7 +90,13 @@ async def root():
 
 
 @app.get("/analyze/{org}", response_model=AnalysisResponse)
-async def analyze_organization(org: str):
+async def analyze_organization(
+    org: str,
+    fetcher: Annotated[GitHubFetcher, Depends(get_fetcher)],
+    selector: Annotated[RepoSelector, Depends(get_selector)],
+    scorer: Annotated[HealthScorer, Depends(get_scorer)],
+    exporter: Annotated[ResultExporter, Depends(get_exporter)],
+):
     """
     Analyze a GitHub organization and return scores.
 
@@ -53,25 +106,24 @@ async def analyze_organization(org: str):
     """
     try:
         # Run the analysis
-        scores = await analyze_org(org)
+        result = await analyze_org(
+            org, fetcher=fetcher, selector=selector, scorer=scorer, exporter=exporter
+        )
 
-        if not scores:
+        if not result.scores:
             raise HTTPException(
                 status_code=404,
                 detail=f"No repositories found or analyzed for organization '{org}'",
             )
 
-        # Calculate average
-        avg_score = sum(scores.values()) / len(scores) if scores else 0
-
         # Path to results file
         results_file = f"results/{org}.json"
 
         return AnalysisResponse(
             organization=org,
-            repository_scores=scores,
-            total_repos_analyzed=len(scores),
-            average_score=round(avg_score, 1),
+            repository_scores=result.scores,
+            total_repos_analyzed=len(result.scores),
+            average_score=result.summary["average_health_score"],
             results_file=results_file,
         )
 
@@ -1,97 +1,185 @@
 """SQLite cache for GitHub API responses."""
 
-import json
+import asyncio
+import time
+from collections import OrderedDict
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
 import aiosqlite
+import orjson
 
+# Bump when the table layout changes; older cache tables are dropped on open
+SCHEMA_VERSION = 2
 
-class Cache:
-    """Async SQLite cache for API responses."""
 
-    def __init__(self, db_path: str = "cache.db", ttl_hours: int = 1):
+class Cache:
+    """Async SQLite cache for API responses, fronted by an in-memory LRU."""
+
+    def __init__(
+        self,
+        db_path: str = "cache.db",
+        ttl_hours: int = 1,
+        flush_threshold: int = 64,
+        memory_size: int = 1024,
+    ):
         self.db_path = db_path
         self.ttl = timedelta(hours=ttl_hours)
-
-    async def _init_db(self):
-        """Initialize the database schema."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS cache (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    expires_at TEXT NOT NULL
-                )
-            """
-            )
-            await db.commit()
+        self._db: aiosqlite.Connection | None = None
+        self._init_lock = asyncio.Lock()
+
+        # In-process LRU in front of SQLite: key -> (serialized value, expires_at)
+        self._memory: OrderedDict[str, tuple[bytes, int]] = OrderedDict()
+        self._memory_size = memory_size
+
+        # Writes are buffered and committed together in one transaction
+        self._pending: list[tuple[str, bytes, int, int]] = []
+        self._flush_threshold = flush_threshold
+        self._flush_lock = asyncio.Lock()
+
+    async def _conn(self) -> aiosqlite.Connection:
+        """Return the shared connection, opening it and the schema on first use."""
+        if self._db is not None:
+            return self._db
+
+        async with self._init_lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.db_path)
+                # aiosqlite's worker thread is non-daemon, so a failed setup
+                # must close the connection or the process can't exit
+                try:
+                    await db.executescript(
+                        """
+                        PRAGMA journal_mode=WAL;
+                        PRAGMA synchronous=NORMAL;
+                        PRAGMA temp_store=MEMORY;
+                        PRAGMA cache_size=-64000;
+                    """
+                    )
+
+                    # Cached rows are disposable, so an outdated schema is dropped
+                    cursor = await db.execute("PRAGMA user_version")
+                    row = await cursor.fetchone()
+                    if row is None or row[0] != SCHEMA_VERSION:
+                        await db.execute("DROP TABLE IF EXISTS cache")
+
+                    await db.executescript(
+                        f"""
+                        CREATE TABLE IF NOT EXISTS cache (
+                            key TEXT PRIMARY KEY,
+                            value BLOB NOT NULL,
+                            created_at INTEGER NOT NULL,
+                            expires_at INTEGER NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_expires ON cache (expires_at);
+                        PRAGMA user_version = {SCHEMA_VERSION};
+                    """
+                    )
+
+                    # Reap rows left expired by earlier runs; reads skip them
+                    await db.execute(
+                        "DELETE FROM cache WHERE expires_at <= ?", (int(time.time()),)
+                    )
+                    await db.commit()
+                except BaseException:
+                    await db.close()
+                    raise
+                self._db = db
+
+        return self._db
 
     def _make_key(self, prefix: str, identifier: str) -> str:
         """Create a cache key from prefix and identifier."""
         return f"{prefix}:{identifier}"
 
+    def _remember(self, key: str, value: bytes, expires_at: int) -> None:
+        """Store serialized value in the in-memory LRU tier."""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
     async def get(self, prefix: str, identifier: str) -> Any | None:
         """Get value from cache if not expired."""
-        await self._init_db()
         key = self._make_key(prefix, identifier)
+        now = int(time.time())
 
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
-            )
-            row = await cursor.fetchone()
+        # Memory tier first; holds bytes so callers never share mutable values
+        hit = self._memory.get(key)
+        if hit is not None:
+            value, expires_at = hit
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                return orjson.loads(value)
+            del self._memory[key]
+
+        if self._pending:
+            await self.flush()
 
-            if not row:
-                return None
+        db = await self._conn()
 
-            value_json, expires_at_str = row
-            expires_at = datetime.fromisoformat(expires_at_str)
+        # Expired rows are skipped here and reaped on open or by clear_expired()
+        cursor = await db.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+            (key, now),
+        )
+        row = await cursor.fetchone()
 
-            # Check if expired
-            if datetime.now(UTC) > expires_at:
-                # Clean up expired entry
-                await db.execute("DELETE FROM cache WHERE key = ?", (key,))
-                await db.commit()
-                return None
+        if not row:
+            return None
 
-            return json.loads(value_json)
+        self._remember(key, row[0], row[1])
+        return orjson.loads(row[0])
 
     async def set(self, prefix: str, identifier: str, value: Any) -> None:
-        """Store value in cache with TTL."""
-        await self._init_db()
+        """Store value in cache with TTL (buffered until the next flush)."""
         key = self._make_key(prefix, identifier)
 
         now = datetime.now(UTC)
-        expires_at = now + self.ttl
+        expires_at = int((now + self.ttl).timestamp())
+        data = orjson.dumps(value)
 
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
+        self._remember(key, data, expires_at)
+        self._pending.append((key, data, int(now.timestamp()), expires_at))
+
+        if len(self._pending) >= self._flush_threshold:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write all buffered entries in a single transaction."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, []
+            db = await self._conn()
+            await db.executemany(
                 """
                 INSERT OR REPLACE INTO cache (key, value, created_at, expires_at)
                 VALUES (?, ?, ?, ?)
             """,
-                (key, json.dumps(value), now.isoformat(), expires_at.isoformat()),
+                batch,
             )
             await db.commit()
 
     async def clear_expired(self) -> None:
         """Remove all expired entries."""
-        await self._init_db()
-
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "DELETE FROM cache WHERE expires_at < ?",
-                (datetime.now(UTC).isoformat(),),
-            )
-            await db.commit()
+        await self.flush()
+        db = await self._conn()
+        await db.execute("DELETE FROM cache WHERE expires_at <= ?", (int(time.time()),))
+        await db.commit()
 
     async def clear_all(self) -> None:
         """Clear entire cache."""
-        await self._init_db()
-
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM cache")
-            await db.commit()
+        self._pending.clear()
+        self._memory.clear()
+        db = await self._conn()
+        await db.execute("DELETE FROM cache")
+        await db.commit()
+
+    async def close(self) -> None:
+        """Flush buffered writes and close the shared connection."""
+        await self.flush()
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
@@ -1,16 +1,32 @@
 """Main analysis engine that orchestrates the workflow."""
 
+import asyncio
+from operator import itemgetter
+from typing import Any, NamedTuple
 
-from .cache import Cache
 from .exporter import ResultExporter
 from .fetcher import GitHubFetcher
 from .scorer import HealthScorer
 from .selector import RepoSelector
 
 
+class AnalysisResult(NamedTuple):
+    """Scores per repo plus the summary written to the results file."""
+
+    scores: dict[str, int]
+    summary: dict[str, Any]
+
+
 async def analyze_org(
-    org: str, use_cache: bool = True, clear_cache: bool = False
-) -> dict[str, int]:
+    org: str,
+    use_cache: bool = True,
+    clear_cache: bool = False,
+    *,
+    fetcher: GitHubFetcher | None = None,
+    selector: RepoSelector | None = None,
+    scorer: HealthScorer | None = None,
+    exporter: ResultExporter | None = None,
+) -> AnalysisResult:
     """
     Analyze a GitHub organization and return health scores.
 
@@ -22,27 +38,36 @@ async def analyze_org(
 
     Args:
         org: GitHub organization name
-        use_cache: Whether to use cached data (default: True)
-        clear_cache: Clear cache before running (default: False)
+        use_cache: Whether to use cached data (default: True); ignored when a
+            fetcher is supplied, which keeps its own cache setting
+        clear_cache: Clear cache before running (default: False); clears the
+            supplied fetcher's cache if there is one
+        fetcher: Shared fetcher to use; a new one is created and closed if omitted
+        selector: Shared selector to use; a new one is created if omitted
+        scorer: Shared scorer to use; a new one is created if omitted
+        exporter: Shared exporter to use; a new one is created if omitted
 
     Returns:
-        Dict mapping repo names to their health scores
+        AnalysisResult with repo names mapped to their health scores and the
+        summary statistics exported alongside them
     """
     print(f"\n🔍 Analyzing {org}...")
 
-    # Clear cache if requested
-    if clear_cache and use_cache:
-        cache = Cache()
-        await cache.clear_all()
-        print("🗑️  Cache cleared")
-
-    # Initialize components
-    fetcher = GitHubFetcher(use_cache=use_cache)
-    selector = RepoSelector()
-    scorer = HealthScorer()
-    exporter = ResultExporter()
+    # Initialize components not supplied by the caller
+    owns_fetcher = fetcher is None
+    if fetcher is None:
+        fetcher = GitHubFetcher(use_cache=use_cache)
+    selector = selector or RepoSelector()
+    scorer = scorer or HealthScorer()
+    exporter = exporter or ResultExporter()
 
     try:
+        # Clear cache if requested; this is the fetcher's own cache, wherever
+        # its database lives
+        if clear_cache and fetcher.cache:
+            await fetcher.cache.clear_all()
+            print("🗑️  Cache cleared")
+
         # Fetch all repos
         print("📥 Fetching repositories from GitHub...")
         repos = await fetcher.fetch_org_repos(org)
@@ -55,7 +80,7 @@ async def analyze_org(
 
         if not repos:
             print(f"❌ No repositories found for organization '{org}'")
-            return {}
+            return AnalysisResult({}, {})
 
         # Select important ones
         print("🎯 Selecting important repositories...")
@@ -63,44 +88,47 @@ async def analyze_org(
 
         if not important_repos:
             print("❌ No repositories met the selection criteria")
-            return {}
+            return AnalysisResult({}, {})
 
-        # Calculate scores
+        # Fetch scoring details for the selected repos only
+        print("📥 Fetching details for selected repositories...")
+        important_repos = await fetcher.fetch_repo_details(org, important_repos)
+
+        # Calculate scores in one batch, off the event loop
         print("📊 Calculating health scores...")
+        scores = await asyncio.to_thread(scorer.calculate_scores, important_repos)
+        print(f"   Scored {len(scores)} repositories")
+
         repo_scores = []
         scores_dict = {}
 
-        for i, repo in enumerate(important_repos, 1):
-            repo_name = repo.get("name", "unknown")
-            print(f"  [{i}/{len(important_repos)}] Scoring {repo_name}...", end="\r")
-
-            score = scorer.calculate_score(repo)
-
+        for repo, score in zip(important_repos, scores, strict=True):
             # Add score to repo data for export
             repo["health_score"] = score
             repo_scores.append(repo)
 
             # Also keep simple dict for return value
-            scores_dict[repo_name] = score
+            scores_dict[repo.get("name", "unknown")] = score
 
-        print()  # New line after progress
+        # Sort once by score; shared by the export and the top 5 display
+        sorted_repos = sorted(repo_scores, key=itemgetter("health_score"), reverse=True)
 
         # Export results
         print("💾 Exporting results...")
-        output_file = exporter.export_results(org, repo_scores, total_repos)
+        summary = exporter.summarize(sorted_repos, total_repos)
+        output_file = exporter.export_results(
+            org, sorted_repos, total_repos, pre_sorted=True, summary=summary
+        )
         print(f"✅ Results saved to {output_file}")
 
         # Print summary
-        avg_score = sum(scores_dict.values()) / len(scores_dict) if scores_dict else 0
         print(f"\n📈 Summary for {org}:")
         print(f"   - Total repositories: {total_repos}")
         print(f"   - Repositories analyzed: {len(important_repos)}")
-        print(f"   - Average health score: {avg_score:.1f}/100")
+        print(f"   - Average health score: {summary['average_health_score']:.1f}/100")
 
         # Show top 5 repos
-        top_repos = sorted(repo_scores, key=lambda r: r["health_score"], reverse=True)[
-            :5
-        ]
+        top_repos = sorted_repos[:5]
         if top_repos:
             print("\n🏆 Top 5 repositories:")
             for i, repo in enumerate(top_repos, 1):
@@ -108,8 +136,16 @@ async def analyze_org(
                     f"   {i}. {repo['name']}: {repo['health_score']}/100 ⭐ {repo['stargazerCount']}"
                 )
 
-        return scores_dict
+        return AnalysisResult(scores_dict, summary)
 
     except Exception as e:
         print(f"\n❌ Error analyzing {org}: {str(e)}")
         raise
+
+    finally:
+        if owns_fetcher:
+            await fetcher.close()
+        elif fetcher.cache:
+            # A shared fetcher stays open; commit this run's writes so other
+            # processes see them and a hard kill can't lose them
+            await fetcher.cache.flush()
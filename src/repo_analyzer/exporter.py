@@ -1,10 +1,49 @@
 """Export analysis results to JSON format."""
 
-import json
+from dataclasses import dataclass
 from datetime import UTC, datetime
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
+import orjson
+
+
+@dataclass(slots=True)
+class RepoRecord:
+    """A single repository entry in the exported results."""
+
+    name: str
+    url: str
+    description: str | None
+    health_score: int
+    stars: int
+    forks: int
+    primary_language: str | None
+    last_pushed: str
+    topics: list[str]
+
+    @classmethod
+    def from_repo(cls, repo: dict[str, Any]) -> "RepoRecord":
+        """Build a record from scored GraphQL repository data."""
+        primary_language = repo.get("primaryLanguage")
+        return cls(
+            name=repo["name"],
+            url=repo["url"],
+            description=repo.get("description", ""),
+            health_score=repo["health_score"],
+            stars=repo["stargazerCount"],
+            forks=repo["forkCount"],
+            primary_language=(
+                primary_language.get("name") if primary_language else None
+            ),
+            last_pushed=repo.get("pushedAt", ""),
+            topics=[
+                node["topic"]["name"]
+                for node in repo.get("repositoryTopics", {}).get("nodes", [])
+            ],
+        )
+
 
 class ResultExporter:
     """Exports analysis results to JSON files."""
@@ -13,8 +52,37 @@ class ResultExporter:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
 
+    def summarize(
+        self, sorted_repos: list[dict[str, Any]], total_repos_found: int
+    ) -> dict[str, Any]:
+        """
+        Compute summary statistics for scored repos.
+
+        Args:
+            sorted_repos: Scored repos, sorted by score (descending)
+            total_repos_found: Total repositories found before filtering
+        """
+        scores = [r["health_score"] for r in sorted_repos]
+
+        return {
+            "total_repos_in_org": total_repos_found,
+            "repos_analyzed": len(sorted_repos),
+            "average_health_score": (
+                round(sum(scores) / len(scores), 1) if scores else 0
+            ),
+            # Upper median, matching sorted(scores)[len(scores) // 2]
+            "median_health_score": (scores[(len(scores) - 1) // 2] if scores else 0),
+            "top_score": scores[0] if scores else 0,
+            "bottom_score": scores[-1] if scores else 0,
+        }
+
     def export_results(
-        self, org: str, repo_scores: list[dict[str, Any]], total_repos_found: int
+        self,
+        org: str,
+        repo_scores: list[dict[str, Any]],
+        total_repos_found: int,
+        pre_sorted: bool = False,
+        summary: dict[str, Any] | None = None,
     ) -> Path:
         """
         Export repository scores to JSON file.
@@ -23,56 +91,40 @@ class ResultExporter:
             org: Organization name
             repo_scores: List of dicts with repo data and scores
             total_repos_found: Total repositories found before filtering
+            pre_sorted: Whether repo_scores is already sorted by score, descending
+            summary: Precomputed output of summarize(), if the caller has one
         """
         output_file = self.output_dir / f"{org}.json"
+        payload = self._build_payload(
+            org, repo_scores, total_repos_found, pre_sorted, summary
+        )
+        self._write(payload, output_file)
+
+        return output_file
 
+    def _build_payload(
+        self,
+        org: str,
+        repo_scores: list[dict[str, Any]],
+        total_repos_found: int,
+        pre_sorted: bool = False,
+        summary: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """Assemble the export document; arguments as for export_results()."""
         # Sort repos by score (descending)
-        sorted_repos = sorted(
-            repo_scores, key=lambda r: r["health_score"], reverse=True
+        sorted_repos = (
+            repo_scores
+            if pre_sorted
+            else sorted(repo_scores, key=itemgetter("health_score"), reverse=True)
         )
 
-        # Create summary statistics
-        scores = [r["health_score"] for r in sorted_repos]
-
-        data = {
+        return {
             "organization": org,
             "analyzed_at": datetime.now(UTC).isoformat(),
-            "summary": {
-                "total_repos_in_org": total_repos_found,
-                "repos_analyzed": len(sorted_repos),
-                "average_health_score": (
-                    round(sum(scores) / len(scores), 1) if scores else 0
-                ),
-                "median_health_score": (
-                    sorted(scores)[len(scores) // 2] if scores else 0
-                ),
-                "top_score": max(scores) if scores else 0,
-                "bottom_score": min(scores) if scores else 0,
-            },
-            "repositories": [
-                {
-                    "name": repo["name"],
-                    "url": repo["url"],
-                    "description": repo.get("description", ""),
-                    "health_score": repo["health_score"],
-                    "stars": repo["stargazerCount"],
-                    "forks": repo["forkCount"],
-                    "primary_language": (
-                        repo.get("primaryLanguage", {}).get("name")
-                        if repo.get("primaryLanguage")
-                        else None
-                    ),
-                    "last_pushed": repo.get("pushedAt", ""),
-                    "topics": [
-                        node["topic"]["name"]
-                        for node in repo.get("repositoryTopics", {}).get("nodes", [])
-                    ],
-                }
-                for repo in sorted_repos
-            ],
+            "summary": summary or self.summarize(sorted_repos, total_repos_found),
+            "repositories": [RepoRecord.from_repo(repo) for repo in sorted_repos],
         }
 
-        with open(output_file, "w") as f:
-            json.dump(data, f, indent=2)
-
-        return output_file
+    def _write(self, payload: dict[str, Any], output_file: Path) -> None:
+        """Serialize the export document to disk."""
+        output_file.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
@@ -1,77 +1,226 @@
 """GitHub API fetcher with rate limiting and GraphQL support."""
 
 import asyncio
+import functools
+import hashlib
 import os
+import random
+import re
 from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Final
 
 import httpx
+import orjson
 
 from .cache import Cache
+from .ratelimit import RateLimiter
+
+
+def _minify_query(query: str) -> str:
+    """Strip comments and collapse whitespace so each request uploads fewer bytes."""
+    query = re.sub(r"#[^\n]*", "", query)
+    return re.sub(r"\s+", " ", query).strip()
+
+
+# GraphQL query for listing an organization's repositories
+_ORG_REPOS_QUERY: Final[str] = _minify_query("""
+query($org: String!, $cursor: String) {
+    organization(login: $org) {
+        repositories(first: 100, after: $cursor, orderBy: {field: STARGAZERS, direction: DESC}) {
+            nodes {
+                # Only what selection needs; details come later
+                id
+                name
+                url
+                isArchived
+                isFork
+                isEmpty
+                isPrivate
+                stargazerCount
+                forkCount
+                pushedAt
+            }
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
+            totalCount
+        }
+    }
+}
+""")
+
+# GraphQL query for the scoring and export fields of selected repositories
+_REPO_DETAILS_QUERY: Final[str] = _minify_query("""
+query($ids: [ID!]!) {
+    nodes(ids: $ids) {
+        ... on Repository {
+            id
+            description
+            createdAt
+
+            # For issues/PR metrics
+            issues(states: CLOSED, first: 1) {
+                totalCount
+            }
+            pullRequests(states: CLOSED, first: 1) {
+                totalCount
+            }
+
+            # For release info
+            releases(first: 1, orderBy: {field: CREATED_AT, direction: DESC}) {
+                nodes {
+                    createdAt
+                }
+            }
+
+            # For language info
+            primaryLanguage {
+                name
+            }
+
+            # For topics
+            repositoryTopics(first: 10) {
+                nodes {
+                    topic {
+                        name
+                    }
+                }
+            }
+        }
+    }
+}
+""")
+
+# GitHub rejects API requests without a User-Agent
+USER_AGENT: Final[str] = "repo-analyzer/0.1.0"
+
+# Upper bound on concurrent GraphQL requests per fetcher
+MAX_CONCURRENT_REQUESTS = 6
+
+# Transient failures are retried with exponential backoff and jitter
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 6
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 60.0
+
+# Bytes of an error response body included in raised messages
+ERROR_BODY_PREVIEW = 512
+
+# Cache prefixes embed a hash of their query, so changing a query's fields
+# never serves responses cached under the old shape
+_ORG_REPOS_PREFIX: Final[str] = (
+    f"org_repos:{hashlib.sha256(_ORG_REPOS_QUERY.encode()).hexdigest()[:12]}"
+)
+_REPO_DETAILS_PREFIX: Final[str] = (
+    f"repo_details:{hashlib.sha256(_REPO_DETAILS_QUERY.encode()).hexdigest()[:12]}"
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_env() -> None:
+    """Load a local .env file once, without overriding variables already set."""
+    env_file = Path(".env")
+    if not env_file.exists():
+        return
 
-# Try to load .env file if it exists
-env_file = Path(".env")
-if env_file.exists():
     with open(env_file) as f:
         for line in f:
             line = line.strip()
             if line and not line.startswith("#") and "=" in line:
                 key, value = line.split("=", 1)
-                os.environ[key] = value.strip()
+                key = key.removeprefix("export ").strip()
+                value = value.strip()
+
+                # Strip matching surrounding quotes
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+                    value = value[1:-1]
+
+                os.environ.setdefault(key, value)
+
+
+def _parse_retry_after(value: str) -> float | None:
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date)."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
 
 
 class GitHubFetcher:
     """Handles GitHub API calls with rate limiting."""
 
-    def __init__(self, token: str | None = None, use_cache: bool = True):
+    def __init__(
+        self,
+        token: str | None = None,
+        use_cache: bool = True,
+        cache_path: str = "cache.db",
+        cache_ttl_hours: int = 1,
+    ):
+        _load_env()
         self.token = token or os.getenv("GITHUB_TOKEN") or os.getenv("GITHUB_PAT")
         if not self.token:
             print(
                 "Warning: No GitHub token found. API rate limits will be very restrictive."
             )
 
+        # GraphQL always answers with plain JSON; compressed bodies are decoded
+        # by httpx (brotli via the httpx[brotli] extra)
         self.headers = {
             "Authorization": f"Bearer {self.token}" if self.token else "",
-            "Accept": "application/vnd.github.v3+json",
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, br",
+            "User-Agent": USER_AGENT,
         }
         self.graphql_url = "https://api.github.com/graphql"
         self.rest_url = "https://api.github.com"
-        self.cache = Cache() if use_cache else None
+        self.cache = (
+            Cache(db_path=cache_path, ttl_hours=cache_ttl_hours) if use_cache else None
+        )
         self.rate_limit_info: dict[str, int] = {}
-
-    def _update_rate_limit_info(self, headers: dict) -> None:
-        """Extract and store rate limit information from response headers."""
-        # Try both REST and GraphQL rate limit headers
-        if "x-ratelimit-limit" in headers or "X-RateLimit-Limit" in headers:
-            # Headers might be lowercase
-            limit_key = (
-                "x-ratelimit-limit"
-                if "x-ratelimit-limit" in headers
-                else "X-RateLimit-Limit"
-            )
-            remaining_key = (
-                "x-ratelimit-remaining"
-                if "x-ratelimit-remaining" in headers
-                else "X-RateLimit-Remaining"
-            )
-            used_key = (
-                "x-ratelimit-used"
-                if "x-ratelimit-used" in headers
-                else "X-RateLimit-Used"
-            )
-            reset_key = (
-                "x-ratelimit-reset"
-                if "x-ratelimit-reset" in headers
-                else "X-RateLimit-Reset"
+        self._client: httpx.AsyncClient | None = None
+
+        # Caps in-flight GraphQL requests across all concurrent callers
+        self._request_slots = asyncio.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+        # Paces requests against the hourly budget instead of hitting the ceiling
+        self._limiter = RateLimiter()
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=30.0,
+                headers=self.headers,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
             )
+        return self._client
 
+    def _update_rate_limit_info(self, headers: httpx.Headers) -> None:
+        """Extract and store rate limit information from response headers."""
+        # httpx.Headers lookups are already case-insensitive
+        if "x-ratelimit-limit" in headers:
             self.rate_limit_info = {
-                "limit": int(headers.get(limit_key, 0)),
-                "remaining": int(headers.get(remaining_key, 0)),
-                "used": int(headers.get(used_key, 0)),
-                "reset": int(headers.get(reset_key, 0)),
+                k: int(headers.get(f"x-ratelimit-{k}", 0))
+                for k in ("limit", "remaining", "used", "reset")
             }
+            if self.rate_limit_info["limit"]:
+                self._limiter.sync(
+                    self.rate_limit_info["limit"],
+                    self.rate_limit_info["remaining"],
+                    self.rate_limit_info["reset"],
+                )
 
     def get_rate_limit_status(self) -> str | None:
         """Get formatted rate limit status."""
@@ -99,148 +248,48 @@ class GitHubFetcher:
         """Fetch all repositories for an organization using GraphQL."""
         # Check cache first
         if self.cache:
-            cached_data = await self.cache.get("org_repos", org)
+            cached_data = await self.cache.get(_ORG_REPOS_PREFIX, org)
             if cached_data:
-                print(f"📦 Using cached data for {org} (expires in 1 hour)")
+                ttl_hours = int(self.cache.ttl.total_seconds() // 3600)
+                print(f"📦 Using cached data for {org} (cached for up to {ttl_hours}h)")
                 return list(cached_data)
 
-        query = """
-        query($org: String!, $cursor: String) {
-            organization(login: $org) {
-                repositories(first: 50, after: $cursor, orderBy: {field: STARGAZERS, direction: DESC}) {
-                    nodes {
-                        name
-                        nameWithOwner
-                        description
-                        url
-                        isArchived
-                        isFork
-                        isEmpty
-                        isPrivate
-                        stargazerCount
-                        forkCount
-                        createdAt
-                        updatedAt
-                        pushedAt
-
-                        # For commit frequency
-                        defaultBranchRef {
-                            target {
-                                ... on Commit {
-                                    history(first: 1) {
-                                        totalCount
-                                    }
-                                }
-                            }
-                        }
-
-                        # For issues/PR metrics
-                        issues(states: CLOSED, first: 1) {
-                            totalCount
-                        }
-                        pullRequests(states: CLOSED, first: 1) {
-                            totalCount
-                        }
-
-                        # For release info
-                        releases(first: 1, orderBy: {field: CREATED_AT, direction: DESC}) {
-                            nodes {
-                                createdAt
-                            }
-                        }
-
-                        # For language info
-                        primaryLanguage {
-                            name
-                        }
-
-                        # For topics
-                        repositoryTopics(first: 10) {
-                            nodes {
-                                topic {
-                                    name
-                                }
-                            }
-                        }
-                    }
-                    pageInfo {
-                        hasNextPage
-                        endCursor
-                    }
-                    totalCount
-                }
-            }
-        }
-        """
-
-        all_repos = []
-        cursor = None
         api_calls = 0
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            while True:
-                variables = {"org": org, "cursor": cursor}
+        client = await self._get_client()
+        page = await self._fetch_page(client, org, None)
+
+        # The first page reports the final size, so fill a preallocated list
+        # rather than growing one page at a time
+        all_repos: list[Any] = [None] * page["totalCount"]
+        filled = 0
+
+        while True:
+            api_calls += 1
+
+            # GitHub cursors are opaque, so pages can't be requested out of
+            # order; instead issue the next request as soon as its cursor is
+            # known and merge the current page while it is in flight.
+            page_info = page["pageInfo"]
+            next_page = (
+                asyncio.create_task(
+                    self._fetch_page(client, org, page_info["endCursor"])
+                )
+                if page_info["hasNextPage"]
+                else None
+            )
 
-                try:
-                    response = await client.post(
-                        self.graphql_url,
-                        json={"query": query, "variables": variables},
-                        headers=self.headers,
-                    )
-                    response.raise_for_status()
-                    api_calls += 1
-
-                    # Update rate limit info
-                    self._update_rate_limit_info(dict(response.headers))
-
-                    # Check rate limits
-                    if "X-RateLimit-Remaining" in response.headers:
-                        remaining = int(response.headers["X-RateLimit-Remaining"])
-                        if remaining < 10:
-                            reset_time = int(response.headers["X-RateLimit-Reset"])
-                            sleep_time = (
-                                reset_time - int(datetime.now().timestamp()) + 1
-                            )
-                            if sleep_time > 0:
-                                print(
-                                    f"Rate limit low ({remaining} remaining). Sleeping for {sleep_time}s..."
-                                )
-                                await asyncio.sleep(sleep_time)
-
-                    data = response.json()
-
-                    if "errors" in data:
-                        print(f"GraphQL errors: {data['errors']}")
-                        raise Exception(f"GraphQL query failed: {data['errors']}")
-
-                    org_data = data.get("data", {}).get("organization")
-                    if not org_data:
-                        raise Exception(f"Organization '{org}' not found")
-
-                    repos = org_data["repositories"]["nodes"]
-                    all_repos.extend(repos)
-
-                    page_info = org_data["repositories"]["pageInfo"]
-                    if not page_info["hasNextPage"]:
-                        break
-
-                    cursor = page_info["endCursor"]
-
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code == 401:
-                        raise Exception(
-                            "Invalid GitHub token. Please check your GITHUB_TOKEN."
-                        ) from None
-                    elif e.response.status_code == 404:
-                        raise Exception(f"Organization '{org}' not found") from None
-                    else:
-                        if e.response.status_code == 502:
-                            raise Exception(
-                                "GitHub servers are temporarily unavailable (502). Try again in a few moments or try a smaller organization."
-                            ) from None
-                        raise Exception(
-                            f"GitHub API error: {e.response.status_code} - {e.response.text}"
-                        ) from None
+            nodes = page["nodes"]
+            all_repos[filled : filled + len(nodes)] = nodes
+            filled += len(nodes)
+
+            if next_page is None:
+                break
+
+            page = await next_page
+
+        # Repos may be created or deleted mid-fetch; keep what actually arrived
+        del all_repos[filled:]
 
         print(
             f"Fetched {len(all_repos)} repositories from {org} (used {api_calls} API calls)"
@@ -248,10 +297,185 @@ class GitHubFetcher:
 
         # Cache the results
         if self.cache:
-            await self.cache.set("org_repos", org, all_repos)
+            await self.cache.set(_ORG_REPOS_PREFIX, org, all_repos)
 
         return all_repos
 
+    async def fetch_repo_details(
+        self, org: str, repos: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch scoring and export fields for the given repos and merge them in.
+
+        Only called for the repos that survived selection, so the expensive
+        per-repo connections are never requested for the rest of the org.
+        """
+        details: dict[str, dict[str, Any]] = {}
+
+        if self.cache:
+            for repo in repos:
+                cached = await self.cache.get(_REPO_DETAILS_PREFIX, repo["id"])
+                if cached:
+                    details[repo["id"]] = cached
+
+        missing = [repo["id"] for repo in repos if repo["id"] not in details]
+
+        if missing:
+            client = await self._get_client()
+
+            # nodes() accepts at most 100 ids per request; batches are
+            # independent, so they are requested concurrently
+            responses = await asyncio.gather(
+                *(
+                    self._post_graphql(
+                        client, _REPO_DETAILS_QUERY, {"ids": missing[i : i + 100]}, org
+                    )
+                    for i in range(0, len(missing), 100)
+                )
+            )
+            api_calls = len(responses)
+
+            for data in responses:
+                for node in data["data"]["nodes"]:
+                    if node:
+                        details[node["id"]] = node
+                        if self.cache:
+                            await self.cache.set(_REPO_DETAILS_PREFIX, node["id"], node)
+
+            print(
+                f"Fetched details for {len(missing)} repositories (used {api_calls} API calls)"
+            )
+
+        for repo in repos:
+            repo.update(details.get(repo["id"], {}))
+
+        return repos
+
+    async def _fetch_page(
+        self, client: httpx.AsyncClient, org: str, cursor: str | None
+    ) -> dict[str, Any]:
+        """Fetch one page of an organization's repositories."""
+        data = await self._post_graphql(
+            client, _ORG_REPOS_QUERY, {"org": org, "cursor": cursor}, org
+        )
+
+        org_data = data.get("data", {}).get("organization")
+        if not org_data:
+            raise Exception(f"Organization '{org}' not found")
+
+        repositories: dict[str, Any] = org_data["repositories"]
+        return repositories
+
+    async def _post_with_retry(
+        self, client: httpx.AsyncClient, query: str, variables: dict[str, Any]
+    ) -> httpx.Response:
+        """POST to the GraphQL endpoint, retrying transient failures with backoff."""
+        for attempt in range(MAX_RETRIES + 1):
+            await self._limiter.acquire()
+
+            try:
+                async with self._request_slots:
+                    response = await client.post(
+                        self.graphql_url,
+                        json={"query": query, "variables": variables},
+                    )
+                response.raise_for_status()
+                return response
+
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                retry_after = (
+                    e.response.headers.get("Retry-After")
+                    if isinstance(e, httpx.HTTPStatusError)
+                    else None
+                )
+                retryable = (
+                    isinstance(e, httpx.TransportError)
+                    or e.response.status_code in RETRY_STATUSES
+                    or retry_after is not None
+                )
+                if not retryable or attempt == MAX_RETRIES:
+                    raise
+
+                # Exponential backoff with jitter, unless the server says when
+                server_delay = (
+                    _parse_retry_after(retry_after) if retry_after is not None else None
+                )
+                if server_delay is not None:
+                    delay = server_delay
+                else:
+                    backoff = RETRY_BASE_DELAY * 2**attempt
+                    delay = min(RETRY_MAX_DELAY, backoff) + random.uniform(
+                        0, 0.25 * backoff
+                    )
+
+                reason = (
+                    e.response.status_code
+                    if isinstance(e, httpx.HTTPStatusError)
+                    else type(e).__name__
+                )
+                print(f"GitHub request failed ({reason}). Retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    async def _post_graphql(
+        self,
+        client: httpx.AsyncClient,
+        query: str,
+        variables: dict[str, Any],
+        org: str,
+    ) -> dict[str, Any]:
+        """POST a GraphQL query and return the parsed response body."""
+        try:
+            response = await self._post_with_retry(client, query, variables)
+
+            # Update rate limit info; a nearly spent budget pauses the limiter
+            # so the next request waits, rather than stalling this response
+            self._update_rate_limit_info(response.headers)
+
+            data: dict[str, Any] = orjson.loads(response.content)
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise Exception(
+                    "Invalid GitHub token. Please check your GITHUB_TOKEN."
+                ) from None
+            elif e.response.status_code == 404:
+                raise Exception(f"Organization '{org}' not found") from None
+            else:
+                if e.response.status_code == 502:
+                    raise Exception(
+                        "GitHub servers are temporarily unavailable (502). Try again in a few moments or try a smaller organization."
+                    ) from None
+                # Error pages can be large; show a prefix without decoding it all
+                body = e.response.content[:ERROR_BODY_PREVIEW].decode(
+                    "utf-8", "replace"
+                )
+                raise Exception(
+                    f"GitHub API error: {e.response.status_code} - {body}"
+                ) from None
+
+        if "errors" in data:
+            print(f"GraphQL errors: {data['errors']}")
+            raise Exception(f"GraphQL query failed: {data['errors']}")
+
+        return data
+
+    async def __aenter__(self) -> "GitHubFetcher":
+        await self._get_client()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the HTTP client and the cache connection held by this fetcher."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.cache:
+            await self.cache.close()
+
     async def fetch_additional_metrics(self, repo_name: str) -> dict[str, Any]:
         """Fetch additional metrics that aren't available in GraphQL."""
         # This could fetch commit activity, contributor stats, etc.
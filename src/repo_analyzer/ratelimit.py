@@ -0,0 +1,60 @@
+"""Token-bucket rate limiter for GitHub API requests."""
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Paces requests so the hourly GitHub budget is never exhausted."""
+
+    def __init__(
+        self, capacity: int = 5000, period: float = 3600.0, low_water: int = 10
+    ):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        # Below low_water remaining, all requests wait for the server-side reset
+        self.low_water = low_water
+        self._paused_until = 0.0
+
+    def _refill(self) -> None:
+        """Add the tokens accrued since the last update."""
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.refill_rate
+        )
+        self._updated = now
+
+    async def acquire(self, cost: int = 1) -> None:
+        """Wait until `cost` tokens are available, then take them."""
+        async with self._lock:
+            # Held under the lock, so waiters resume one at a time after a pause
+            pause = self._paused_until - time.time()
+            if pause > 0:
+                print(f"Rate limit low. Sleeping for {pause:.0f}s until reset...")
+                await asyncio.sleep(pause)
+                self._paused_until = 0.0
+
+            self._refill()
+            if self.tokens < cost:
+                await asyncio.sleep((cost - self.tokens) / self.refill_rate)
+                self._refill()
+            self.tokens -= cost
+
+    def sync(self, limit: int, remaining: int, reset: int = 0) -> None:
+        """Align the bucket with the budget reported by the server.
+
+        `reset` is the epoch second the server budget renews; when fewer than
+        `low_water` requests remain, acquire() holds everyone until then.
+        """
+        self._refill()
+        if limit != self.capacity:
+            self.refill_rate *= limit / self.capacity
+            self.capacity = limit
+        self.tokens = float(min(remaining, limit))
+
+        if remaining < self.low_water and reset:
+            self._paused_until = reset + 1
@@ -1,24 +1,80 @@
 """Repository health score calculator."""
 
+import functools
+from bisect import bisect_left, bisect_right
 from datetime import UTC, datetime
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Final
+
+# Threshold ladders, ascending. Day-based metrics score a value by the first
+# threshold it does not exceed (bisect_left); count-based metrics by the number
+# of thresholds it meets or beats (bisect_right). Each score table has one more
+# entry than its thresholds.
+_COMMIT_FREQUENCY_DAYS: Final = (7, 30, 90, 180, 365)
+_COMMIT_FREQUENCY_SCORES: Final = (100, 80, 60, 40, 20, 0)
+
+_RESPONSIVENESS_CLOSED: Final = (5, 10, 20, 50, 100)
+_RESPONSIVENESS_SCORES: Final = (10, 20, 40, 60, 80, 100)
+
+_RELEASE_CADENCE_DAYS: Final = (30, 90, 180, 365)
+_RELEASE_CADENCE_SCORES: Final = (100, 80, 60, 40, 20)
+
+_CONTRIBUTORS_FORKS: Final = (2, 5, 10, 20, 50)
+_CONTRIBUTORS_SCORES: Final = (10, 20, 40, 60, 80, 100)
+
+_STAR_GROWTH_PER_MONTH: Final = (0.5, 1, 2, 5, 10, 20, 50, 100)
+_STAR_GROWTH_SCORES: Final = (20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+_CI_HEALTH_DAYS: Final = (1, 7, 14, 30)
+_CI_HEALTH_SCORES: Final = (100, 90, 80, 70, 50)
+
+
+def _parse_gh_ts(value: str) -> datetime:
+    """Parse a GitHub ISO 8601 timestamp into an aware datetime."""
+    # GitHub always sends the fixed-width "YYYY-MM-DDTHH:MM:SSZ" form
+    if len(value) == 20 and value[19] == "Z":
+        return datetime(
+            int(value[0:4]),
+            int(value[5:7]),
+            int(value[8:10]),
+            int(value[11:13]),
+            int(value[14:16]),
+            int(value[17:19]),
+            tzinfo=UTC,
+        )
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
 
 class HealthScorer:
     """Calculates health scores for repositories."""
 
-    def __init__(self):
-        # Weights for each metric (must sum to 1.0)
-        self.weights = {
-            "commit_frequency": 0.30,
-            "responsiveness": 0.25,
-            "release_cadence": 0.15,
-            "contributors": 0.10,
-            "star_growth": 0.10,
-            "ci_health": 0.10,
-        }
-
-    def calculate_score(self, repo_data: dict[str, Any]) -> int:
+    # Metrics in scoring order, with their weights (must sum to 1.0)
+    _METRICS: Final = (
+        "commit_frequency",
+        "responsiveness",
+        "release_cadence",
+        "contributors",
+        "star_growth",
+        "ci_health",
+    )
+    _WEIGHTS: Final = (0.30, 0.25, 0.15, 0.10, 0.10, 0.10)
+
+    # Read-only name -> weight view, shared by all instances
+    weights: Final = MappingProxyType(dict(zip(_METRICS, _WEIGHTS, strict=True)))
+
+    def calculate_scores(
+        self, repos: list[dict[str, Any]], now: datetime | None = None
+    ) -> list[int]:
+        """Calculate health scores for a batch of repos, in input order.
+
+        All repos are scored against one reference time, resolved once per batch.
+        """
+        now = now or datetime.now(UTC)
+        return [self._score_repo(repo, now) for repo in repos]
+
+    def calculate_score(
+        self, repo_data: dict[str, Any], now: datetime | None = None
+    ) -> int:
         """
         Calculate health score (0-100) based on various metrics.
 
@@ -29,188 +85,132 @@ class HealthScorer:
         - Contributors (10%): Unique contributors (90 days)
         - Star growth (10%): Star growth rate (12 months)
         - CI health (10%): CI pass rate (last 20 runs)
+
+        Args:
+            repo_data: GraphQL repository data
+            now: Reference time; defaults to the current time
         """
-        scores = {}
+        return self.calculate_scores([repo_data], now)[0]
 
-        # 1. Commit Frequency Score (30%)
-        scores["commit_frequency"] = self._score_commit_frequency(repo_data)
+    def _score_repo(self, repo_data: dict[str, Any], now: datetime) -> int:
+        """Score a single repo against the batch reference time."""
+        # Reduce the repo to the plain values the metrics depend on
+        pushed_at = repo_data.get("pushedAt")
+        days_since_push = (now - _parse_gh_ts(pushed_at)).days if pushed_at else None
 
-        # 2. Responsiveness Score (25%)
-        scores["responsiveness"] = self._score_responsiveness(repo_data)
+        created_at = repo_data.get("createdAt")
+        repo_age_days = (now - _parse_gh_ts(created_at)).days if created_at else None
 
-        # 3. Release Cadence Score (15%)
-        scores["release_cadence"] = self._score_release_cadence(repo_data)
+        releases = repo_data.get("releases", {}).get("nodes", [])
+        days_since_release = (
+            (now - _parse_gh_ts(releases[0]["createdAt"])).days if releases else None
+        )
 
-        # 4. Contributors Score (10%)
-        scores["contributors"] = self._score_contributors(repo_data)
+        # Without open counts, we'll use total closed as a proxy for activity
+        closed_issues = repo_data.get("issues", {}).get("totalCount", 0)
+        closed_prs = repo_data.get("pullRequests", {}).get("totalCount", 0)
+
+        return _score_values(
+            days_since_push,
+            closed_issues + closed_prs,
+            days_since_release,
+            repo_age_days,
+            repo_data.get("forkCount", 0),
+            repo_data.get("stargazerCount", 0),
+        )
 
-        # 5. Star Growth Score (10%)
-        scores["star_growth"] = self._score_star_growth(repo_data)
 
-        # 6. CI Health Score (10%)
-        scores["ci_health"] = self._score_ci_health(repo_data)
+# Scores are a pure function of a few integers, so repeat inputs are served from
+# the cache whatever the repo or reference time
+@functools.lru_cache(maxsize=8192)
+def _score_values(
+    days_since_push: int | None,
+    total_closed: int,
+    days_since_release: int | None,
+    repo_age_days: int | None,
+    forks: int,
+    stars: int,
+) -> int:
+    """Combine the metric inputs into a weighted 0-100 health score."""
+    # Component scores, in HealthScorer._METRICS order
+    scores = (
+        _score_commit_frequency(days_since_push),
+        _score_responsiveness(total_closed),
+        _score_release_cadence(days_since_release, repo_age_days),
+        _score_contributors(forks),
+        _score_star_growth(stars, repo_age_days),
+        _score_ci_health(days_since_push),
+    )
+
+    # Calculate weighted sum
+    total_score = sum(
+        score * weight
+        for score, weight in zip(scores, HealthScorer._WEIGHTS, strict=True)
+    )
+
+    # Round to integer 0-100
+    return max(0, min(100, round(total_score)))
+
+
+def _score_commit_frequency(days_since_push: int | None) -> float:
+    """Score based on commit frequency in the last 90 days."""
+    # For now, use pushedAt as a proxy (since getting commit history is expensive)
+    if days_since_push is None:
+        return 0
+
+    # Score based on recency of push
+    return _COMMIT_FREQUENCY_SCORES[
+        bisect_left(_COMMIT_FREQUENCY_DAYS, days_since_push)
+    ]
+
+
+def _score_responsiveness(total_closed: int) -> float:
+    """Score based on issue/PR closure rates."""
+    # More closed items = more responsive (simplified); some points for existing
+    return _RESPONSIVENESS_SCORES[bisect_right(_RESPONSIVENESS_CLOSED, total_closed)]
+
+
+def _score_release_cadence(
+    days_since_release: int | None, repo_age_days: int | None
+) -> float:
+    """Score based on days since last release."""
+    if days_since_release is None:
+        # No releases; if repo is less than 30 days old, don't penalize
+        if repo_age_days is not None and repo_age_days < 30:
+            return 50
+        return 0
 
-        # Calculate weighted sum
-        total_score = sum(
-            scores[metric] * self.weights[metric] for metric in self.weights
-        )
+    # Score based on recency
+    return _RELEASE_CADENCE_SCORES[
+        bisect_left(_RELEASE_CADENCE_DAYS, days_since_release)
+    ]
 
-        # Round to integer 0-100
-        return max(0, min(100, round(total_score)))
-
-    def _score_commit_frequency(self, repo: dict[str, Any]) -> float:
-        """Score based on commit frequency in the last 90 days."""
-        # For now, use pushedAt as a proxy (since getting commit history is expensive)
-        pushed_at = repo.get("pushedAt")
-        if not pushed_at:
-            return 0
-
-        pushed_date = datetime.fromisoformat(pushed_at.replace("Z", "+00:00"))
-        days_since_push = (datetime.now(UTC) - pushed_date).days
-
-        # Score based on recency of push
-        if days_since_push <= 7:
-            return 100
-        elif days_since_push <= 30:
-            return 80
-        elif days_since_push <= 90:
-            return 60
-        elif days_since_push <= 180:
-            return 40
-        elif days_since_push <= 365:
-            return 20
-        else:
-            return 0
-
-    def _score_responsiveness(self, repo: dict[str, Any]) -> float:
-        """Score based on issue/PR closure rates."""
-        # We have total closed issues and PRs from GraphQL
-        closed_issues = repo.get("issues", {}).get("totalCount", 0)
-        closed_prs = repo.get("pullRequests", {}).get("totalCount", 0)
 
-        # Without open counts, we'll use total closed as a proxy for activity
-        total_closed = closed_issues + closed_prs
-
-        # More closed items = more responsive (simplified)
-        if total_closed >= 100:
-            return 100
-        elif total_closed >= 50:
-            return 80
-        elif total_closed >= 20:
-            return 60
-        elif total_closed >= 10:
-            return 40
-        elif total_closed >= 5:
-            return 20
-        else:
-            return 10  # Give some points for existing
-
-    def _score_release_cadence(self, repo: dict[str, Any]) -> float:
-        """Score based on days since last release."""
-        releases = repo.get("releases", {}).get("nodes", [])
-
-        if not releases:
-            # No releases, check if it's a new repo
-            created_at = repo.get("createdAt")
-            if created_at:
-                created_date = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                repo_age_days = (datetime.now(UTC) - created_date).days
-
-                # If repo is less than 30 days old, don't penalize
-                if repo_age_days < 30:
-                    return 50
-            return 0
-
-        last_release = releases[0]
-        release_date = datetime.fromisoformat(
-            last_release["createdAt"].replace("Z", "+00:00")
-        )
-        days_since_release = (datetime.now(UTC) - release_date).days
-
-        # Score based on recency
-        if days_since_release <= 30:
-            return 100
-        elif days_since_release <= 90:
-            return 80
-        elif days_since_release <= 180:
-            return 60
-        elif days_since_release <= 365:
-            return 40
-        else:
-            return 20
-
-    def _score_contributors(self, repo: dict[str, Any]) -> float:
-        """Score based on contributor diversity."""
-        # Without expensive API calls, use forks as proxy for community
-        forks = repo.get("forkCount", 0)
-
-        # Forks indicate potential contributors
-        if forks >= 50:
-            return 100
-        elif forks >= 20:
-            return 80
-        elif forks >= 10:
-            return 60
-        elif forks >= 5:
-            return 40
-        elif forks >= 2:
-            return 20
-        else:
-            return 10
-
-    def _score_star_growth(self, repo: dict[str, Any]) -> float:
-        """Score based on star growth rate."""
-        stars = repo.get("stargazerCount", 0)
-        created_at = repo.get("createdAt")
-
-        if not created_at or stars == 0:
-            return 0
-
-        # Calculate stars per month
-        created_date = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-        repo_age_days = max(1, (datetime.now(UTC) - created_date).days)
-        repo_age_months = max(1, repo_age_days / 30)
-
-        stars_per_month = stars / repo_age_months
-
-        # Score based on growth rate
-        if stars_per_month >= 100:
-            return 100
-        elif stars_per_month >= 50:
-            return 90
-        elif stars_per_month >= 20:
-            return 80
-        elif stars_per_month >= 10:
-            return 70
-        elif stars_per_month >= 5:
-            return 60
-        elif stars_per_month >= 2:
-            return 50
-        elif stars_per_month >= 1:
-            return 40
-        elif stars_per_month >= 0.5:
-            return 30
-        else:
-            return 20
-
-    def _score_ci_health(self, repo: dict[str, Any]) -> float:
-        """Score based on CI health (using push recency as proxy)."""
-        # Without access to CI data, use recent push as proxy for active development
-        pushed_at = repo.get("pushedAt")
-        if not pushed_at:
-            return 50  # Neutral score if no data
-
-        pushed_date = datetime.fromisoformat(pushed_at.replace("Z", "+00:00"))
-        days_since_push = (datetime.now(UTC) - pushed_date).days
-
-        # Recent pushes suggest active CI
-        if days_since_push <= 1:
-            return 100
-        elif days_since_push <= 7:
-            return 90
-        elif days_since_push <= 14:
-            return 80
-        elif days_since_push <= 30:
-            return 70
-        else:
-            return 50  # Don't heavily penalize
+def _score_contributors(forks: int) -> float:
+    """Score based on contributor diversity."""
+    # Without expensive API calls, use forks as proxy for community
+    return _CONTRIBUTORS_SCORES[bisect_right(_CONTRIBUTORS_FORKS, forks)]
+
+
+def _score_star_growth(stars: int, repo_age_days: int | None) -> float:
+    """Score based on star growth rate."""
+    if repo_age_days is None or stars == 0:
+        return 0
+
+    # Calculate stars per month
+    repo_age_months = max(1, max(1, repo_age_days) / 30)
+
+    stars_per_month = stars / repo_age_months
+
+    # Score based on growth rate
+    return _STAR_GROWTH_SCORES[bisect_right(_STAR_GROWTH_PER_MONTH, stars_per_month)]
+
+
+def _score_ci_health(days_since_push: int | None) -> float:
+    """Score based on CI health (using push recency as proxy)."""
+    # Without access to CI data, use recent push as proxy for active development
+    if days_since_push is None:
+        return 50  # Neutral score if no data
+
+    # Recent pushes suggest active CI; don't heavily penalize older ones
+    return _CI_HEALTH_SCORES[bisect_left(_CI_HEALTH_DAYS, days_since_push)]
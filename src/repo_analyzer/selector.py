@@ -1,7 +1,15 @@
 """Repository selector - filters and ranks repos by importance."""
 
-from datetime import UTC
-from typing import Any
+import heapq
+from datetime import UTC, datetime
+from operator import itemgetter
+from typing import Any, Final
+
+from .scorer import _parse_gh_ts
+
+# Repos with any of these flags set are never analyzed: archived, forks, empty,
+# and private (in case they're included)
+_SKIP_KEYS: Final = ("isArchived", "isFork", "isEmpty", "isPrivate")
 
 
 class RepoSelector:
@@ -19,26 +27,8 @@ class RepoSelector:
         - Empty repos
         - Private repos (if included)
         """
-        # First, filter out repos we don't want to analyze
-        filtered_repos = []
-        for repo in repos:
-            # Skip archived repos
-            if repo.get("isArchived", False):
-                continue
-
-            # Skip forks
-            if repo.get("isFork", False):
-                continue
-
-            # Skip empty repos
-            if repo.get("isEmpty", False):
-                continue
-
-            # Skip private repos (in case they're included)
-            if repo.get("isPrivate", False):
-                continue
-
-            filtered_repos.append(repo)
+        # One reference time for the whole ranking
+        now = datetime.now(UTC)
 
         # Calculate importance score for ranking
         def importance_score(repo: dict[str, Any]) -> float:
@@ -51,10 +41,8 @@ class RepoSelector:
             # Boost score for repos with recent activity
             pushed_at = repo.get("pushedAt")
             if pushed_at:
-                from datetime import datetime
-
-                pushed_date = datetime.fromisoformat(pushed_at.replace("Z", "+00:00"))
-                days_since_push = (datetime.now(UTC) - pushed_date).days
+                pushed_date = _parse_gh_ts(pushed_at)
+                days_since_push = (now - pushed_date).days
 
                 # Boost repos pushed in last 30 days
                 if days_since_push < 30:
@@ -65,35 +53,40 @@ class RepoSelector:
 
             return float(score)
 
-        # Sort by importance score
-        filtered_repos.sort(key=importance_score, reverse=True)
+        # Filter and score in one pass, so each repo is scored exactly once
+        scored = []
+        total_stars = 0
+        for repo in repos:
+            if any(repo.get(key) for key in _SKIP_KEYS):
+                continue
+
+            scored.append((importance_score(repo), repo))
+            total_stars += repo.get("stargazerCount", 0)
+
+        # Only the top max_repos can be selected; nlargest keeps ties in input order
+        ranked = [
+            repo for _, repo in heapq.nlargest(max_repos, scored, key=itemgetter(0))
+        ]
 
         # Select top repos that represent significant portion of org's activity
-        if len(filtered_repos) <= max_repos:
-            selected = filtered_repos
+        if len(scored) <= max_repos:
+            selected = ranked
         else:
-            # Calculate total stars in org
-            total_stars = sum(r.get("stargazerCount", 0) for r in filtered_repos)
-
             # Select repos until we have 80% of total stars or max_repos
             selected = []
             accumulated_stars = 0
 
-            for repo in filtered_repos:
+            for repo in ranked:
                 selected.append(repo)
                 accumulated_stars += repo.get("stargazerCount", 0)
 
-                # Stop if we've reached max repos
-                if len(selected) >= max_repos:
-                    break
-
                 # Stop if we've covered 80% of total stars (but take at least 5)
                 if len(selected) >= 5 and accumulated_stars >= total_stars * 0.8:
                     break
 
         print(
             f"Selected {len(selected)} repos out of {len(repos)} total "
-            f"({len(filtered_repos)} after filtering)"
+            f"({len(scored)} after filtering)"
         )
 
         return selected
@@ -1,129 +1,286 @@
 """Tests for the repo analyzer components."""
 
 import os
+import sqlite3
 import tempfile
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Mapping
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any
 from unittest.mock import AsyncMock, Mock, patch
 
+import httpx
+import orjson
 import pytest
+import respx
+from fastapi.testclient import TestClient
+from time_machine import TimeMachineFixture
 
+from repo_analyzer.api import app, get_exporter, get_fetcher, get_scorer, get_selector
 from repo_analyzer.cache import Cache
-from repo_analyzer.engine import analyze_org
+from repo_analyzer.engine import AnalysisResult, analyze_org
 from repo_analyzer.exporter import ResultExporter
-from repo_analyzer.fetcher import GitHubFetcher
-from repo_analyzer.scorer import HealthScorer
+from repo_analyzer.fetcher import _ORG_REPOS_PREFIX, GitHubFetcher, _load_env
+from repo_analyzer.ratelimit import RateLimiter
+from repo_analyzer.scorer import (
+    HealthScorer,
+    _parse_gh_ts,
+    _score_ci_health,
+    _score_commit_frequency,
+    _score_contributors,
+    _score_release_cadence,
+    _score_responsiveness,
+    _score_star_growth,
+    _score_values,
+)
 from repo_analyzer.selector import RepoSelector
 
+# Fixed reference time for fixture timestamps; tests that compare against the
+# clock freeze it here with the frozen_time fixture
+NOW = datetime(2024, 6, 1, tzinfo=UTC)
+DAY = timedelta(days=1)
 
-class TestHealthScorer:
-    """Test the health scoring logic."""
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def frozen_time(time_machine: TimeMachineFixture) -> None:
+    """Stop the wall clock at NOW for the duration of a test."""
+    time_machine.move_to(NOW, tick=False)
 
-    def test_perfect_score(self):
-        """Test a repository that should get a perfect score."""
-        scorer = HealthScorer()
 
-        # Mock repo data with perfect metrics
-        repo_data = {
+# 50 repos with 0..49 stars, for exercising the selection cap
+_REPOS_50 = tuple({"name": f"repo{i}", "stargazerCount": i} for i in range(50))
+
+
+@pytest.fixture(scope="module")
+def perfect_repo_data() -> Mapping[str, Any]:
+    """Repo data with perfect metrics."""
+    return MappingProxyType(
+        {
             "name": "perfect-repo",
             "stargazerCount": 10000,
             "forkCount": 500,
-            "pushedAt": datetime.now(UTC).isoformat(),
-            "createdAt": (datetime.now(UTC) - timedelta(days=365)).isoformat(),
+            "pushedAt": NOW.isoformat(),
+            "createdAt": (NOW - 365 * DAY).isoformat(),
             "issues": {"totalCount": 1000},
             "pullRequests": {"totalCount": 500},
-            "releases": {
-                "nodes": [{"createdAt": datetime.now(UTC).isoformat()}]
-            },
+            "releases": {"nodes": [{"createdAt": NOW.isoformat()}]},
         }
+    )
 
-        score = scorer.calculate_score(repo_data)
-        assert score >= 90  # Should be very high
-
-    def test_abandoned_repo(self):
-        """Test a repository that appears abandoned."""
-        scorer = HealthScorer()
 
-        # Mock repo data for abandoned project
-        repo_data = {
+@pytest.fixture(scope="module")
+def abandoned_repo_data() -> Mapping[str, Any]:
+    """Repo data for an abandoned project."""
+    return MappingProxyType(
+        {
             "name": "abandoned-repo",
             "stargazerCount": 100,
             "forkCount": 5,
-            "pushedAt": (datetime.now(UTC) - timedelta(days=730)).isoformat(),
-            "createdAt": (
-                datetime.now(UTC) - timedelta(days=1000)
-            ).isoformat(),
+            "pushedAt": (NOW - 730 * DAY).isoformat(),
+            "createdAt": (NOW - 1000 * DAY).isoformat(),
             "issues": {"totalCount": 10},
             "pullRequests": {"totalCount": 2},
             "releases": {"nodes": []},
         }
+    )
 
-        score = scorer.calculate_score(repo_data)
+
+@pytest.fixture(scope="session")
+def mock_repo_template() -> Mapping[str, Any]:
+    """Repo returned by the mocked fetcher in engine tests, pushed at NOW."""
+    return MappingProxyType(orjson.loads((FIXTURES / "mock_repo.json").read_bytes()))
+
+
+@pytest.fixture(scope="session")
+def cache_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """One temporary directory shared by every cache test in the session."""
+    return tmp_path_factory.mktemp("cache")
+
+
+@pytest.fixture
+def cache_path(cache_dir: Path, request: pytest.FixtureRequest) -> str:
+    """A database file private to the requesting test."""
+    return str(cache_dir / f"{request.node.name}.db")
+
+
+@pytest.fixture(scope="module")
+def selector() -> RepoSelector:
+    """A stateless selector shared across the module."""
+    return RepoSelector()
+
+
+@pytest.fixture(scope="module")
+async def fetcher() -> AsyncIterator[GitHubFetcher]:
+    """A cache-less fetcher shared by the module, closed on teardown."""
+    async with GitHubFetcher(use_cache=False) as shared:
+        yield shared
+
+
+@pytest.fixture(scope="class")
+def scorer() -> HealthScorer:
+    """One scorer per test class; it holds no per-call state."""
+    return HealthScorer()
+
+
+@pytest.mark.usefixtures("frozen_time")
+class TestHealthScorer:
+    """Test the health scoring logic."""
+
+    def test_perfect_score(self, scorer, perfect_repo_data):
+        """Test a repository that should get a perfect score."""
+        score = scorer.calculate_score(perfect_repo_data)
+        assert score >= 90  # Should be very high
+
+    def test_abandoned_repo(self, scorer, abandoned_repo_data):
+        """Test a repository that appears abandoned."""
+        score = scorer.calculate_score(abandoned_repo_data)
         assert score < 30  # Should be very low
 
-    def test_score_range(self):
+    def test_score_range(self, scorer):
         """Test that scores are always in valid range."""
-        scorer = HealthScorer()
-
         # Test with minimal data
         repo_data = {"name": "test"}
         score = scorer.calculate_score(repo_data)
 
         assert 0 <= score <= 100
 
-    def test_score_weights(self):
+    def test_score_weights(self, scorer):
         """Test that all scoring weights sum to 1.0 (not 100)."""
-        scorer = HealthScorer()
         total_weight = sum(scorer.weights.values())
         assert abs(total_weight - 1.0) < 0.0001  # Allow for floating point precision
 
-
-class TestRepoSelector:
-    """Test the repository selection logic."""
-
-    def test_filters_archived(self):
-        """Test that archived repos are filtered out."""
-        selector = RepoSelector()
-
+    def test_batch_matches_single(self, scorer):
+        """Test that batch scoring agrees with scoring repos one at a time."""
         repos = [
-            {"name": "active", "isArchived": False, "stargazerCount": 100},
-            {"name": "archived", "isArchived": True, "stargazerCount": 200},
+            {"name": "empty"},
+            {
+                "name": "active",
+                "stargazerCount": 120,
+                "forkCount": 12,
+                "pushedAt": (NOW - 3 * DAY).isoformat(),
+                "createdAt": (NOW - 400 * DAY).isoformat(),
+                "issues": {"totalCount": 30},
+                "pullRequests": {"totalCount": 25},
+            },
         ]
 
-        selected = selector.select_important_repos(repos)
-        assert len(selected) == 1
-        assert selected[0]["name"] == "active"
-
-    def test_filters_forks(self):
-        """Test that forks are filtered out."""
-        selector = RepoSelector()
-
-        repos = [
-            {"name": "original", "isFork": False, "stargazerCount": 100},
-            {"name": "fork", "isFork": True, "stargazerCount": 200},
-        ]
+        expected = [scorer.calculate_score(repo, NOW) for repo in repos]
+        assert scorer.calculate_scores(repos, NOW) == expected
+
+    def test_repeat_inputs_hit_score_cache(self, scorer):
+        """Test that repos reducing to the same metric inputs share a cached score."""
+        repo = {"forkCount": 7, "stargazerCount": 3}
+
+        _score_values.cache_clear()
+        first = scorer.calculate_score(repo, NOW)
+        second = scorer.calculate_score({**repo, "name": "other"}, NOW)
+
+        assert first == second
+        assert _score_values.cache_info().hits == 1
+
+    @pytest.mark.parametrize(
+        ("metric", "args", "expected"),
+        [
+            # Each threshold and the value just past it
+            (_score_commit_frequency, (7,), 100),
+            (_score_commit_frequency, (8,), 80),
+            (_score_commit_frequency, (30,), 80),
+            (_score_commit_frequency, (31,), 60),
+            (_score_commit_frequency, (90,), 60),
+            (_score_commit_frequency, (91,), 40),
+            (_score_commit_frequency, (180,), 40),
+            (_score_commit_frequency, (181,), 20),
+            (_score_commit_frequency, (365,), 20),
+            (_score_commit_frequency, (366,), 0),
+            (_score_commit_frequency, (None,), 0),
+            (_score_responsiveness, (100,), 100),
+            (_score_responsiveness, (99,), 80),
+            (_score_responsiveness, (50,), 80),
+            (_score_responsiveness, (49,), 60),
+            (_score_responsiveness, (20,), 60),
+            (_score_responsiveness, (19,), 40),
+            (_score_responsiveness, (10,), 40),
+            (_score_responsiveness, (9,), 20),
+            (_score_responsiveness, (5,), 20),
+            (_score_responsiveness, (4,), 10),
+            (_score_release_cadence, (30, None), 100),
+            (_score_release_cadence, (31, None), 80),
+            (_score_release_cadence, (90, None), 80),
+            (_score_release_cadence, (91, None), 60),
+            (_score_release_cadence, (180, None), 60),
+            (_score_release_cadence, (181, None), 40),
+            (_score_release_cadence, (365, None), 40),
+            (_score_release_cadence, (366, None), 20),
+            (_score_release_cadence, (None, 29), 50),
+            (_score_release_cadence, (None, 30), 0),
+            (_score_contributors, (50,), 100),
+            (_score_contributors, (49,), 80),
+            (_score_contributors, (20,), 80),
+            (_score_contributors, (19,), 60),
+            (_score_contributors, (10,), 60),
+            (_score_contributors, (9,), 40),
+            (_score_contributors, (5,), 40),
+            (_score_contributors, (4,), 20),
+            (_score_contributors, (2,), 20),
+            (_score_contributors, (1,), 10),
+            (_score_star_growth, (200, 60), 100),
+            (_score_star_growth, (199, 60), 90),
+            (_score_star_growth, (50, 30), 90),
+            (_score_star_growth, (49, 30), 80),
+            (_score_star_growth, (20, 30), 80),
+            (_score_star_growth, (19, 30), 70),
+            (_score_star_growth, (10, 30), 70),
+            (_score_star_growth, (9, 30), 60),
+            (_score_star_growth, (5, 30), 60),
+            (_score_star_growth, (4, 30), 50),
+            (_score_star_growth, (2, 30), 50),
+            (_score_star_growth, (1, 30), 40),
+            (_score_star_growth, (1, 60), 30),
+            (_score_star_growth, (1, 61), 20),
+            (_score_star_growth, (0, 30), 0),
+            (_score_ci_health, (1,), 100),
+            (_score_ci_health, (2,), 90),
+            (_score_ci_health, (7,), 90),
+            (_score_ci_health, (8,), 80),
+            (_score_ci_health, (14,), 80),
+            (_score_ci_health, (15,), 70),
+            (_score_ci_health, (30,), 70),
+            (_score_ci_health, (31,), 50),
+            (_score_ci_health, (None,), 50),
+        ],
+    )
+    def test_ladder_boundaries(self, metric, args, expected):
+        """Test that every scoring ladder keeps its inclusive boundaries."""
+        assert metric(*args) == expected
+
+    def test_parse_gh_ts(self):
+        """Test the fast timestamp parser matches the stdlib one."""
+        expected = datetime(2024, 3, 5, 7, 8, 9, tzinfo=UTC)
+        assert _parse_gh_ts("2024-03-05T07:08:09Z") == expected
+        assert _parse_gh_ts(expected.isoformat()) == expected
 
-        selected = selector.select_important_repos(repos)
-        assert len(selected) == 1
-        assert selected[0]["name"] == "original"
 
-    def test_filters_empty(self):
-        """Test that empty repos are filtered out."""
-        selector = RepoSelector()
+class TestRepoSelector:
+    """Test the repository selection logic."""
 
+    @pytest.mark.parametrize("flag", ["isArchived", "isFork", "isEmpty", "isPrivate"])
+    def test_filters_flag(self, selector, flag):
+        """Test that archived, forked, empty and private repos are filtered out."""
         repos = [
-            {"name": "full", "isEmpty": False, "stargazerCount": 100},
-            {"name": "empty", "isEmpty": True, "stargazerCount": 200},
+            {"name": "keep", flag: False, "stargazerCount": 100},
+            {"name": "drop", flag: True, "stargazerCount": 200},
         ]
 
         selected = selector.select_important_repos(repos)
-        assert len(selected) == 1
-        assert selected[0]["name"] == "full"
+        assert [r["name"] for r in selected] == ["keep"]
 
-    def test_sorts_by_importance(self):
+    def test_sorts_by_importance(self, selector):
         """Test that repos are sorted by importance."""
-        selector = RepoSelector()
-
         repos = [
             {"name": "small", "stargazerCount": 10, "forkCount": 1},
             {"name": "medium", "stargazerCount": 100, "forkCount": 10},
@@ -135,20 +292,18 @@ class TestRepoSelector:
         assert selected[1]["name"] == "medium"
         assert selected[2]["name"] == "small"
 
-    def test_respects_max_repos(self):
+    @pytest.mark.parametrize(
+        ("cap", "expected"),
+        # The top 28 repos already hold 80% of the stars, so 49 stops early
+        [(1, 1), (5, 5), (10, 10), (25, 25), (49, 28)],
+    )
+    def test_respects_max_repos(self, selector, cap, expected):
         """Test that max_repos limit is respected."""
-        selector = RepoSelector()
+        selected = selector.select_important_repos(list(_REPOS_50), max_repos=cap)
+        assert len(selected) == expected
 
-        # Create 50 repos
-        repos = [{"name": f"repo{i}", "stargazerCount": i} for i in range(50)]
-
-        selected = selector.select_important_repos(repos, max_repos=10)
-        assert len(selected) == 10
-
-    def test_80_percent_threshold(self):
+    def test_80_percent_threshold(self, selector):
         """Test that selection stops at 80% of total stars after minimum repos."""
-        selector = RepoSelector()
-
         # Need more repos to test the 80% rule (min 5 repos required)
         repos = [
             {"name": "huge", "stargazerCount": 8000, "forkCount": 0},
@@ -170,85 +325,169 @@ class TestRepoSelector:
 class TestCache:
     """Test the caching functionality."""
 
-    async def test_cache_set_get(self):
-        """Test basic cache set and get operations."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.environ["CACHE_DIR"] = tmpdir
-            cache = Cache()
-
-            # Test set and get
-            await cache.set("test", "key1", {"data": "value1"})
-            result = await cache.get("test", "key1")
-            assert result == {"data": "value1"}
+    async def test_cache_basic_flow(self, cache_path):
+        """Test set, get and clear_all on one cache instance."""
+        cache = Cache(db_path=cache_path)
 
-    async def test_cache_expiry(self):
-        """Test that cache respects TTL."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.environ["CACHE_DIR"] = tmpdir
-            cache = Cache(ttl_hours=0)  # Immediate expiry
+        # Test set and get
+        await cache.set("test", "key1", {"data": "value1"})
+        assert await cache.get("test", "key1") == {"data": "value1"}
 
-            await cache.set("test", "key1", {"data": "value1"})
-            result = await cache.get("test", "key1")
-            assert result is None  # Should be expired
-
-    async def test_cache_clear(self):
-        """Test cache clearing functionality."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.environ["CACHE_DIR"] = tmpdir
-            cache = Cache()
+        # Test clearing everything, including entries still buffered
+        await cache.set("test", "key2", {"data": "value2"})
+        await cache.clear_all()
+        assert await cache.get("test", "key1") is None
+        assert await cache.get("test", "key2") is None
+        await cache.close()
 
-            await cache.set("test", "key1", {"data": "value1"})
-            await cache.clear_all()  # Use clear_all not clear
-            result = await cache.get("test", "key1")
-            assert result is None
+    async def test_cache_expiry(self, cache_path):
+        """Test that cache respects TTL."""
+        cache = Cache(db_path=cache_path, ttl_hours=0)  # Immediate expiry
+
+        await cache.set("test", "key1", {"data": "value1"})
+        result = await cache.get("test", "key1")
+        assert result is None  # Should be expired
+        await cache.close()
+
+    async def test_clear_expired(self, cache_path):
+        """Test that expired rows are kept on read and reaped in bulk."""
+        cache = Cache(db_path=cache_path, ttl_hours=0)
+
+        await cache.set("test", "key1", {"data": "value1"})
+        assert await cache.get("test", "key1") is None
+
+        db = await cache._conn()
+        cursor = await db.execute("SELECT COUNT(*) FROM cache")
+        assert await cursor.fetchone() == (1,)
+
+        await cache.clear_expired()
+        cursor = await db.execute("SELECT COUNT(*) FROM cache")
+        assert await cursor.fetchone() == (0,)
+        await cache.close()
+
+    async def test_expired_rows_reaped_on_open(self, cache_path):
+        """Test that opening the cache deletes rows expired by earlier runs."""
+        cache = Cache(db_path=cache_path, ttl_hours=0)
+        await cache.set("test", "key1", {"data": "value1"})
+        await cache.close()
+
+        cache = Cache(db_path=cache_path)
+        db = await cache._conn()
+        cursor = await db.execute("SELECT COUNT(*) FROM cache")
+        assert await cursor.fetchone() == (0,)
+        await cache.close()
+
+    async def test_memory_tier(self, cache_path):
+        """Test that hits come from memory without sharing mutable values."""
+        cache = Cache(db_path=cache_path)
+
+        await cache.set("test", "key1", {"data": "value1"})
+        result = await cache.get("test", "key1")
+        result["data"] = "mutated"
+        assert await cache.get("test", "key1") == {"data": "value1"}
+        await cache.close()
+
+        # A fresh instance falls back to SQLite and refills its memory tier
+        cache = Cache(db_path=cache_path)
+        assert await cache.get("test", "key1") == {"data": "value1"}
+        assert "test:key1" in cache._memory
+        await cache.close()
+
+    async def test_cache_batches_writes(self, cache_path):
+        """Test that writes are buffered until the flush threshold."""
+        cache = Cache(db_path=cache_path, flush_threshold=3)
+
+        await cache.set("test", "key1", 1)
+        await cache.set("test", "key2", 2)
+        assert len(cache._pending) == 2
+
+        await cache.set("test", "key3", 3)
+        assert cache._pending == []
+        assert await cache.get("test", "key2") == 2
+        await cache.close()
+
+    async def test_cache_reuses_connection(self, cache_path):
+        """Test that one connection is opened and reused until close."""
+        cache = Cache(db_path=cache_path)
+
+        await cache.set("test", "key1", {"data": "value1"})
+        await cache.flush()
+        db = cache._db
+        await cache.get("test", "key2")
+        assert db is not None and cache._db is db
+
+        await cache.close()
+        assert cache._db is None
+
+    async def test_corrupt_database_does_not_leak_connection(self, cache_path):
+        """Test that a failed schema setup closes its connection thread."""
+        Path(cache_path).write_bytes(os.urandom(4096))
+        cache = Cache(db_path=cache_path)
+        before = set(threading.enumerate())
+
+        with pytest.raises(sqlite3.DatabaseError):
+            await cache.get("test", "key1")
+
+        # The non-daemon worker thread would otherwise keep the process alive;
+        # a closed connection's thread winds down shortly after close()
+        assert cache._db is None
+        workers = set(threading.enumerate()) - before
+        for worker in workers:
+            worker.join(timeout=5)
+        assert not any(worker.is_alive() for worker in workers)
+        await cache.close()
 
 
 class TestGitHubFetcher:
     """Test the GitHub API fetcher."""
 
-    def test_env_loading(self):
-        """Test that .env file is loaded automatically."""
-        # Create a temporary .env file
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".env", delete=False) as f:
-            f.write("TEST_ENV_VAR=test_value\n")
-            env_path = f.name
-
-        # Move it to .env in current directory
-        original_cwd = os.getcwd()
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.chdir(tmpdir)
-            os.rename(env_path, ".env")
-
-            # Re-import to trigger .env loading
-            import importlib
-
-            import repo_analyzer.fetcher
-
-            importlib.reload(repo_analyzer.fetcher)
-
-            # Should have loaded the env var
-            assert os.getenv("TEST_ENV_VAR") == "test_value"
-
-            # Cleanup
-            os.chdir(original_cwd)
-            os.environ.pop("TEST_ENV_VAR", None)
-
-    def test_token_priority(self):
+    def test_env_loading(self, tmp_path, monkeypatch):
+        """Test that the .env file in the working directory is loaded."""
+        monkeypatch.chdir(tmp_path)
+        # setenv registers the variable for removal at teardown; delenv then
+        # leaves it unset so the loader's setdefault can fill it in
+        for name in ("TEST_ENV_VAR", "TEST_ENV_EXPORTED"):
+            monkeypatch.setenv(name, "")
+            monkeypatch.delenv(name)
+        Path(".env").write_text(
+            "TEST_ENV_VAR=\"test_value\"\nexport TEST_ENV_EXPORTED='exported'\n"
+        )
+
+        # Call the loader directly; its once-per-process cache is reset around it
+        _load_env.cache_clear()
+        _load_env()
+        _load_env.cache_clear()
+
+        # Should have loaded the env vars, shell-style export prefix included
+        assert os.getenv("TEST_ENV_VAR") == "test_value"
+        assert os.getenv("TEST_ENV_EXPORTED") == "exported"
+
+    def test_env_does_not_override(self, tmp_path, monkeypatch):
+        """Test that variables already in the environment win over .env."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("TEST_ENV_VAR", "real")
+        Path(".env").write_text("TEST_ENV_VAR=from_file\n")
+
+        _load_env.cache_clear()
+        _load_env()
+        _load_env.cache_clear()
+
+        assert os.getenv("TEST_ENV_VAR") == "real"
+
+    def test_token_priority(self, monkeypatch):
         """Test that tokens are loaded in correct priority order."""
         # Test GITHUB_TOKEN takes priority
-        os.environ["GITHUB_TOKEN"] = "token1"
-        os.environ["GITHUB_PAT"] = "token2"
+        monkeypatch.setenv("GITHUB_TOKEN", "token1")
+        monkeypatch.setenv("GITHUB_PAT", "token2")
         fetcher = GitHubFetcher()
         assert fetcher.token == "token1"
 
         # Test GITHUB_PAT is used when GITHUB_TOKEN is not set
-        os.environ.pop("GITHUB_TOKEN", None)
+        monkeypatch.delenv("GITHUB_TOKEN", raising=False)
         fetcher = GitHubFetcher()
         assert fetcher.token == "token2"
 
-        # Cleanup
-        os.environ.pop("GITHUB_PAT", None)
-
+    @pytest.mark.usefixtures("frozen_time")
     def test_rate_limit_formatting(self):
         """Test rate limit status formatting."""
         fetcher = GitHubFetcher()
@@ -256,139 +495,417 @@ class TestGitHubFetcher:
             "limit": 5000,
             "remaining": 4936,
             "used": 64,
-            "reset": int(
-                (datetime.now(UTC) + timedelta(minutes=32)).timestamp()
-            ),
+            "reset": int((NOW + timedelta(minutes=32)).timestamp()),
         }
 
         status = fetcher.get_rate_limit_status()
         assert "64 used" in status
         assert "4936/5000 remaining" in status
-        assert "resets in" in status
+        assert "resets in 32m" in status
 
     @pytest.mark.asyncio
-    async def test_error_handling(self):
-        """Test error handling for various HTTP errors."""
+    async def test_client_is_reused(self):
+        """Test that one HTTP client is shared until the fetcher is closed."""
         fetcher = GitHubFetcher(use_cache=False)
 
-        with patch("httpx.AsyncClient.post") as mock_post:
-            # Test 404 - org not found
-            mock_response = Mock()
-            mock_response.status_code = 404
-            mock_response.raise_for_status.side_effect = Exception("404")
-            mock_post.return_value = mock_response
+        client = await fetcher._get_client()
+        assert await fetcher._get_client() is client
+
+        await fetcher.close()
+        assert client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_async_context_manager(self):
+        """Test that the fetcher opens its client on enter and closes on exit."""
+        async with GitHubFetcher(use_cache=False) as fetcher:
+            client = fetcher._client
+            assert client is not None and not client.is_closed
+
+        assert client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_pagination_merges_pages_in_order(self, fetcher):
+        """Test that pages are followed by cursor and merged in order."""
+        pages = [
+            {
+                "nodes": [{"name": "a"}, {"name": "b"}],
+                "pageInfo": {"hasNextPage": True, "endCursor": "c1"},
+                # One repo is deleted before the second page is fetched
+                "totalCount": 4,
+            },
+            {
+                "nodes": [{"name": "c"}],
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "totalCount": 3,
+            },
+        ]
+
+        with patch.object(
+            GitHubFetcher, "_fetch_page", AsyncMock(side_effect=pages)
+        ) as mock_page:
+            repos = await fetcher.fetch_org_repos("test-org")
+
+        assert [r["name"] for r in repos] == ["a", "b", "c"]
+        assert mock_page.await_args_list[1].args[-1] == "c1"
+
+    @pytest.mark.asyncio
+    async def test_fetch_repo_details_merges_by_id(self, fetcher):
+        """Test that detail fields are fetched by node id and merged back."""
+        repos = [{"id": "R1", "name": "a"}, {"id": "R2", "name": "b"}]
+        response = {
+            "data": {
+                "nodes": [
+                    {"id": "R2", "issues": {"totalCount": 3}},
+                    {"id": "R1", "issues": {"totalCount": 7}},
+                ]
+            }
+        }
+
+        with patch.object(
+            GitHubFetcher, "_post_graphql", AsyncMock(return_value=response)
+        ) as mock_post:
+            result = await fetcher.fetch_repo_details("test-org", repos)
+
+        assert mock_post.await_args.args[2] == {"ids": ["R1", "R2"]}
+        assert [r["issues"]["totalCount"] for r in result] == [7, 3]
+        assert result[0]["name"] == "a"
+
+    @pytest.fixture
+    def mock_sleep(self) -> Iterator[AsyncMock]:
+        """Skip the fetcher's retry backoff sleeps and record them."""
+        with patch(
+            "repo_analyzer.fetcher.asyncio.sleep", new_callable=AsyncMock
+        ) as mock:
+            yield mock
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_retries_transient_errors(self, fetcher, mock_sleep):
+        """Test that 502/429 responses are retried before succeeding."""
+        respx.post("https://api.github.com/graphql").mock(
+            side_effect=[
+                httpx.Response(502),
+                httpx.Response(429, headers={"Retry-After": "3"}),
+                httpx.Response(200, json={"data": {"ok": True}}),
+            ]
+        )
+
+        client = await fetcher._get_client()
+        data = await fetcher._post_graphql(client, "query", {}, "org")
+
+        assert data == {"data": {"ok": True}}
+        assert mock_sleep.await_count == 2
+        assert mock_sleep.await_args_list[1].args[0] == 3.0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "retry_after", ["Wed, 21 Oct 2015 07:28:00 GMT", "not-a-number"]
+    )
+    @respx.mock
+    async def test_non_numeric_retry_after_is_retried(
+        self, fetcher, mock_sleep, retry_after
+    ):
+        """Test that HTTP-date and malformed Retry-After values still retry."""
+        respx.post("https://api.github.com/graphql").mock(
+            side_effect=[
+                httpx.Response(503, headers={"Retry-After": retry_after}),
+                httpx.Response(200, json={"data": {"ok": True}}),
+            ]
+        )
+
+        client = await fetcher._get_client()
+        data = await fetcher._post_graphql(client, "query", {}, "org")
+
+        assert data == {"data": {"ok": True}}
+        mock_sleep.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_error_body_is_truncated(self, fetcher):
+        """Test that large error pages are cut to a short preview."""
+        respx.post("https://api.github.com/graphql").mock(
+            return_value=httpx.Response(403, content=b"x" * 10_000)
+        )
+
+        client = await fetcher._get_client()
+        with pytest.raises(Exception, match="GitHub API error: 403") as exc_info:
+            await fetcher._post_graphql(client, "query", {}, "org")
+
+        assert str(exc_info.value).endswith("x" * 512)
+        assert len(str(exc_info.value)) < 600
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("status", "message"),
+        [
+            (404, "Organization 'nonexistent' not found"),
+            (500, "GitHub API error: 500"),
+            (502, "temporarily unavailable"),
+        ],
+    )
+    @respx.mock
+    async def test_error_handling(self, status, message):
+        """Test error handling for various HTTP errors."""
+        route = respx.post("https://api.github.com/graphql").mock(
+            return_value=httpx.Response(status)
+        )
+
+        # 5xx responses are retried first; skip the backoff sleeps
+        with patch("repo_analyzer.fetcher.asyncio.sleep", new_callable=AsyncMock):
+            async with GitHubFetcher(use_cache=False) as fetcher:
+                with pytest.raises(Exception, match=message):
+                    await fetcher.fetch_org_repos("nonexistent")
 
-            # The actual implementation catches this differently
-            try:
-                await fetcher.fetch_org_repos("nonexistent")
-            except Exception as e:
-                assert "nonexistent" in str(e) or "404" in str(e)
+        assert route.called
+
+
+class TestRateLimiter:
+    """Test the token-bucket rate limiter."""
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_when_empty(self):
+        """Test that acquiring past the budget sleeps for the refill time."""
+        with (
+            # Frozen clock, so no tokens accrue between acquires
+            patch("repo_analyzer.ratelimit.time.monotonic", return_value=0.0),
+            patch(
+                "repo_analyzer.ratelimit.asyncio.sleep", new_callable=AsyncMock
+            ) as mock_sleep,
+        ):
+            limiter = RateLimiter(capacity=2, period=0.2)
+            await limiter.acquire()
+            await limiter.acquire()
+            mock_sleep.assert_not_called()
+
+            await limiter.acquire()
+            mock_sleep.assert_awaited_once()
+            assert mock_sleep.await_args.args[0] == 0.1
+
+    def test_sync_from_server_budget(self):
+        """Test that the bucket follows the limit and remaining from headers."""
+        limiter = RateLimiter()
+        limiter.sync(limit=1000, remaining=42)
+
+        assert limiter.capacity == 1000
+        assert limiter.refill_rate == pytest.approx(1000 / 3600)
+        assert limiter.tokens == 42
+
+    @pytest.mark.asyncio
+    async def test_low_budget_pauses_until_reset(self):
+        """Test that a nearly spent budget holds the next request until reset."""
+        limiter = RateLimiter()
+        reset = int(time.time()) + 100
+        limiter.sync(limit=5000, remaining=3, reset=reset)
+
+        with patch(
+            "repo_analyzer.ratelimit.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep:
+            await limiter.acquire()
+
+        assert mock_sleep.await_args_list[0].args[0] == pytest.approx(101, abs=2)
 
 
 class TestResultExporter:
     """Test the result exporter."""
 
     def test_export_json(self):
-        """Test JSON export functionality."""
+        """Test that results are written to <output_dir>/<org>.json."""
         with tempfile.TemporaryDirectory() as tmpdir:
             exporter = ResultExporter(output_dir=tmpdir)
-
-            # Prepare repo scores in the expected format
             repo_scores = [
                 {
                     "name": "repo1",
                     "url": "https://github.com/org/repo1",
-                    "description": "Test repo",
                     "health_score": 95,
                     "stargazerCount": 100,
                     "forkCount": 10,
-                    "pushedAt": datetime.now(UTC).isoformat(),
                 }
             ]
 
             filepath = exporter.export_results(
                 "test-org", repo_scores, total_repos_found=10
             )
-            assert Path(filepath).exists()
+            assert filepath == Path(tmpdir) / "test-org.json"
 
             # Verify content
-            import json
-
-            with open(filepath) as f:
-                loaded = json.load(f)
+            loaded = orjson.loads(filepath.read_bytes())
             assert loaded["organization"] == "test-org"
             assert loaded["repositories"][0]["health_score"] == 95
-            assert loaded["summary"]["repos_analyzed"] == 1
-            assert loaded["summary"]["total_repos_in_org"] == 10
-
 
-@pytest.mark.asyncio
-class TestEngine:
-    """Test the main analysis engine."""
+    def test_build_payload(self, tmp_path):
+        """Test the export document assembled from repo scores."""
+        exporter = ResultExporter(output_dir=str(tmp_path))
 
-    async def test_analyze_org_flow(self):
-        """Test the complete analysis flow."""
-        # Mock all dependencies
-        mock_repos = [
+        # Prepare repo scores in the expected format
+        repo_scores = [
             {
-                "name": "test-repo",
-                "nameWithOwner": "org/test-repo",
-                "url": "https://github.com/org/test-repo",
-                "description": "Test description",
+                "name": "repo1",
+                "url": "https://github.com/org/repo1",
+                "description": "Test repo",
+                "health_score": 95,
                 "stargazerCount": 100,
                 "forkCount": 10,
-                "isArchived": False,
-                "isFork": False,
-                "isEmpty": False,
-                "pushedAt": datetime.now(UTC).isoformat(),
-                "createdAt": (
-                    datetime.now(UTC) - timedelta(days=365)
-                ).isoformat(),
-                "issues": {"totalCount": 10},
-                "pullRequests": {"totalCount": 5},
-                "releases": {"nodes": []},
-                "primaryLanguage": {"name": "Python"},
-                "repositoryTopics": {"nodes": []},
+                "pushedAt": NOW.isoformat(),
+            }
+        ]
+
+        payload = exporter._build_payload("test-org", repo_scores, 10)
+        assert payload["organization"] == "test-org"
+        assert payload["repositories"][0].health_score == 95
+        assert payload["summary"]["repos_analyzed"] == 1
+        assert payload["summary"]["total_repos_in_org"] == 10
+
+    def test_summary_stats(self, tmp_path):
+        """Test summary statistics computed from the sorted scores."""
+        exporter = ResultExporter(output_dir=str(tmp_path))
+        repo_scores = [
+            {
+                "name": f"repo{score}",
+                "url": f"https://github.com/org/repo{score}",
+                "health_score": score,
+                "stargazerCount": 1,
+                "forkCount": 0,
             }
+            for score in (20, 40, 10, 30)
         ]
 
-        # Mock the fetcher to avoid real API calls
-        mock_fetcher = Mock()
-        mock_fetcher.fetch_org_repos = AsyncMock(return_value=mock_repos)
-        mock_fetcher.get_rate_limit_status = Mock(return_value=None)
+        summary = exporter._build_payload("test-org", repo_scores, 4)["summary"]
+        assert summary["average_health_score"] == 25.0
+        assert summary["median_health_score"] == 30
+        assert summary["top_score"] == 40
+        assert summary["bottom_score"] == 10
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("frozen_time")
+class TestEngine:
+    """Test the main analysis engine."""
+
+    @pytest.fixture(autouse=True)
+    def mock_fetcher(self) -> Iterator[Mock]:
+        """Replace the engine's GitHubFetcher with a mock that avoids real API calls."""
+        # Patch where GitHubFetcher is used in the engine module; autospec keeps
+        # the mock's methods (and their async-ness) in step with the real class
+        with patch("repo_analyzer.engine.GitHubFetcher", autospec=True) as mock_cls:
+            mock = mock_cls.return_value
+            mock.fetch_org_repos.return_value = []
+            mock.fetch_repo_details.side_effect = lambda org, repos: repos
+            mock.get_rate_limit_status.return_value = None
+            mock.cache = None
+            yield mock
+
+    async def test_analyze_org_flow(
+        self, mock_fetcher, mock_repo_template, tmp_path, monkeypatch
+    ):
+        """Test the complete analysis flow."""
+        # Results are written relative to the working directory
+        monkeypatch.chdir(tmp_path)
+
+        # Engine mutates repos in place, so work on a copy of the template
+        mock_fetcher.fetch_org_repos.return_value = [dict(mock_repo_template)]
+
+        # Scoring accuracy is covered by TestHealthScorer
+        with patch("repo_analyzer.engine.HealthScorer") as mock_scorer_cls:
+            mock_scorer_cls.return_value.calculate_scores.return_value = [77]
 
-        # Patch where GitHubFetcher is used in the engine module
-        with patch("repo_analyzer.engine.GitHubFetcher", return_value=mock_fetcher):
             # Run analysis
             result = await analyze_org("test-org", use_cache=False)
 
             # Verify results
             assert result is not None
-            assert result["test-repo"] == 62  # The calculated score
-            assert Path("results/test-org.json").exists()
+            assert result.scores["test-repo"] == 77  # The stubbed score
+            assert result.summary["average_health_score"] == 77
+            assert (tmp_path / "results" / "test-org.json").exists()
+
+    async def test_injected_fetcher_is_not_closed(self, mock_fetcher):
+        """Test that a caller-supplied fetcher is left open for reuse."""
+        result = await analyze_org("test-org", fetcher=mock_fetcher)
+
+        assert result.scores == {}
+        mock_fetcher.close.assert_not_called()
+
+    async def test_clear_cache_clears_injected_fetcher(self, cache_path):
+        """Test that clear_cache empties an injected fetcher's own cache."""
+        fetcher = GitHubFetcher(cache_path=cache_path)
+        await fetcher.cache.set(_ORG_REPOS_PREFIX, "test-org", [{"name": "stale"}])
+
+        with patch.object(GitHubFetcher, "fetch_org_repos", AsyncMock(return_value=[])):
+            await analyze_org("test-org", clear_cache=True, fetcher=fetcher)
+
+        # Nothing left in memory, in the write buffer, or on disk after close
+        assert await fetcher.cache.get(_ORG_REPOS_PREFIX, "test-org") is None
+        await fetcher.close()
+        cache = Cache(db_path=cache_path)
+        assert await cache.get(_ORG_REPOS_PREFIX, "test-org") is None
+        await cache.close()
+
+    async def test_injected_fetcher_cache_is_flushed(self, mock_fetcher, cache_path):
+        """Test that a shared fetcher's buffered cache writes are committed."""
+        cache = Cache(db_path=cache_path)
+        await cache.set("test", "key1", {"data": "value1"})
+        mock_fetcher.cache = cache
+
+        await analyze_org("test-org", fetcher=mock_fetcher)
 
-            # Cleanup
-            Path("results/test-org.json").unlink(missing_ok=True)
+        assert cache._pending == []
+        await cache.close()
 
-    async def test_cache_flag_handling(self):
+    async def test_cache_flag_handling(self, mock_fetcher, cache_path):
         """Test that cache flags are properly handled."""
-        mock_repos = []
-
-        # Mock the fetcher to avoid real API calls
-        mock_fetcher = Mock()
-        mock_fetcher.fetch_org_repos = AsyncMock(return_value=mock_repos)
-        mock_fetcher.get_rate_limit_status = Mock(return_value=None)
-
-        # Patch where GitHubFetcher is used in the engine module
-        with patch("repo_analyzer.engine.GitHubFetcher", return_value=mock_fetcher):
-            with patch(
-                "repo_analyzer.cache.Cache.clear_all", new_callable=AsyncMock
-            ) as mock_clear:
-                # Test clear_cache flag
-                await analyze_org("test-org", clear_cache=True)
-                mock_clear.assert_called_once()
-
-                # Test use_cache=False doesn't clear cache
-                mock_clear.reset_mock()
-                await analyze_org("test-org", use_cache=False)
-                mock_clear.assert_not_called()
+        mock_fetcher.cache = Cache(db_path=cache_path)
+
+        with patch(
+            "repo_analyzer.cache.Cache.clear_all", new_callable=AsyncMock
+        ) as mock_clear:
+            # Test clear_cache flag
+            await analyze_org("test-org", clear_cache=True)
+            mock_clear.assert_called_once()
+
+            # Test use_cache=False doesn't clear cache
+            mock_clear.reset_mock()
+            await analyze_org("test-org", use_cache=False)
+            mock_clear.assert_not_called()
+
+        await mock_fetcher.cache.close()
+
+
+class TestAPI:
+    """Test the web service wiring."""
+
+    @pytest.fixture(autouse=True)
+    def reset_factories(self) -> Iterator[None]:
+        """Drop the per-process components so each test builds its own."""
+        factories = (get_fetcher, get_selector, get_scorer, get_exporter)
+        for factory in factories:
+            factory.cache_clear()
+        yield
+        for factory in factories:
+            factory.cache_clear()
+
+    def test_analyze_shares_components(self, tmp_path, monkeypatch):
+        """Test that requests reuse one fetcher, closed when the app shuts down."""
+        monkeypatch.chdir(tmp_path)
+        # The summary's average differs from the plain mean of the scores
+        result = AnalysisResult({"a": 10, "b": 20}, {"average_health_score": 42.5})
+
+        with (
+            patch("repo_analyzer.api.GitHubFetcher", autospec=True),
+            patch(
+                "repo_analyzer.api.analyze_org", AsyncMock(return_value=result)
+            ) as mock_analyze,
+        ):
+            with TestClient(app) as client:
+                fetcher = get_fetcher()
+                for _ in range(2):
+                    response = client.get("/analyze/test-org")
+                    assert response.status_code == 200
+                    assert response.json()["average_score"] == 42.5
+
+                fetcher.close.assert_not_awaited()
+
+            fetcher.close.assert_awaited_once()
+
+        assert mock_analyze.await_count == 2
+        for call in mock_analyze.await_args_list:
+            assert call.kwargs["fetcher"] is fetcher
+            assert call.kwargs["selector"] is get_selector()